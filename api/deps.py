@@ -0,0 +1,26 @@
+"""Shared service instances for API handlers"""
+
+from functools import lru_cache
+
+from ..core.pipeline import get_pipeline
+from ..dataset import DatasetCollector
+from ..models.csm_mlx import CSMVoiceSynthesizer
+from ..models.rag import RAGEngine
+
+__all__ = ['get_pipeline', 'get_collector', 'get_synthesizer', 'get_rag_engine']
+
+
+@lru_cache()
+def get_collector() -> DatasetCollector:
+    """Dataset collector sharing the process-wide pipeline"""
+    return DatasetCollector(pipeline=get_pipeline())
+
+
+@lru_cache()
+def get_synthesizer() -> CSMVoiceSynthesizer:
+    return CSMVoiceSynthesizer()
+
+
+@lru_cache()
+def get_rag_engine() -> RAGEngine:
+    return RAGEngine()
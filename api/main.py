@@ -1,31 +1,56 @@
 """Main API server for lbrxVoicePro"""
 
-from fastapi import FastAPI, WebSocket, UploadFile, File
+import os
+from pathlib import Path
+
+# Persist Numba's JIT cache for _warmup_numba somewhere writable, even when
+# installed read-only. Must be set before core is imported: kernels pick
+# their cache location when they are decorated.
+os.environ.setdefault("NUMBA_CACHE_DIR", str(Path.home() / ".cache" / "lbrxvoicepro" / "numba"))
+
+from fastapi import FastAPI, WebSocket, UploadFile, File, Depends, HTTPException
 from fastapi.responses import JSONResponse, StreamingResponse
 import uvicorn
-from pathlib import Path
 import asyncio
+import io
+import json
 from typing import Optional
+import numpy as np
 
 from ..core import VoicePipeline, AudioRecorder
+from ..core import _convert, _vad_jit
+from ..core.pipeline import decode_audio_bytes
 from ..dataset import DatasetCollector
 from ..models.csm_mlx import CSMVoiceSynthesizer
 from ..models.rag import RAGEngine
+from .deps import get_pipeline, get_collector, get_synthesizer, get_rag_engine
 
 app = FastAPI(title="lbrxVoicePro API", version="1.0.0")
 
-# Initialize components
-pipeline = VoicePipeline()
-synthesizer = CSMVoiceSynthesizer()
-collector = DatasetCollector()
-rag_engine = RAGEngine()
+
+async def decode_upload_to_f32(file: UploadFile) -> np.ndarray:
+    """Decode an upload to a 16kHz float32 waveform without touching disk"""
+    content = await file.read()
+    try:
+        return await asyncio.to_thread(decode_audio_bytes, content)
+    except ValueError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+
+
+def _warmup_numba():
+    """Trigger JIT compilation (or cache loads) so requests never stall on it"""
+    _vad_jit.warmup()
+    _convert.warmup()
 
 
 @app.on_event("startup")
 async def startup():
     """Initialize models on startup"""
-    await pipeline.initialize()
-    await synthesizer.initialize()
+    await asyncio.gather(
+        get_pipeline().initialize(),
+        asyncio.to_thread(_warmup_numba)
+    )
+    await get_synthesizer().initialize()
     print("✅ lbrxVoicePro API ready")
 
 
@@ -36,6 +61,7 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "transcription": "/api/v1/transcribe",
+            "transcription_full": "/api/v1/transcribe/full",
             "synthesis": "/api/v1/synthesize",
             "dataset": "/api/v1/dataset/collect",
             "rag": "/api/v1/rag/query"
@@ -43,49 +69,110 @@ async def root():
     }
 
 
+async def _transcribe_jsonl(pipeline: VoicePipeline,
+                            audio: np.ndarray,
+                            language: str,
+                            word_timestamps: bool):
+    """Yield one JSON line per transcribed speech segment"""
+    async for segment in pipeline.transcribe_segments(audio, language, word_timestamps):
+        yield json.dumps(segment, ensure_ascii=False) + "\n"
+
+
 @app.post("/api/v1/transcribe")
 async def transcribe_audio(
     file: UploadFile = File(...),
-    language: str = "pl"
+    language: str = "pl",
+    word_timestamps: bool = False,
+    pipeline: VoicePipeline = Depends(get_pipeline)
 ):
-    """Transcribe audio file"""
+    """Transcribe audio file, streaming segments as NDJSON"""
     
-    # Save uploaded file
-    temp_path = Path(f"/tmp/{file.filename}")
-    with open(temp_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
+    # Decode before streaming starts, the upload is closed afterwards
+    audio = await decode_upload_to_f32(file)
     
-    # Transcribe
-    result = await pipeline.transcribe_file(temp_path, language)
+    return StreamingResponse(
+        _transcribe_jsonl(pipeline, audio, language, word_timestamps),
+        media_type="application/x-ndjson"
+    )
+
+
+@app.post("/api/v1/transcribe/full")
+async def transcribe_audio_full(
+    file: UploadFile = File(...),
+    language: str = "pl",
+    word_timestamps: bool = False,
+    pipeline: VoicePipeline = Depends(get_pipeline)
+):
+    """Transcribe audio file in one shot"""
+    
+    # Decode upload in memory
+    audio = await decode_upload_to_f32(file)
     
-    # Clean up
-    temp_path.unlink()
+    # Transcribe
+    result = await pipeline.transcribe_file(audio, language, word_timestamps)
     
     return JSONResponse(content=result)
 
 
 @app.websocket("/api/v1/transcribe/stream")
-async def transcribe_stream(websocket: WebSocket):
-    """Real-time transcription via WebSocket"""
+async def transcribe_stream(
+    websocket: WebSocket,
+    language: str = "pl",
+    pipeline: VoicePipeline = Depends(get_pipeline)
+):
+    """Real-time transcription via WebSocket
+    
+    Incoming int16 PCM is re-sliced into fixed chunks with an overlap
+    prefix. Receiving, chunking and transcription run as separate tasks
+    linked by queues, so a slow send never holds up decoding.
+    """
     
     await websocket.accept()
     
-    try:
-        async def audio_generator():
+    # Bounded so a client sending faster than we chunk is slowed by the socket
+    frames: asyncio.Queue = asyncio.Queue(maxsize=32)
+    chunks: asyncio.Queue = asyncio.Queue(maxsize=2)
+    
+    async def receive_frames():
+        try:
             while True:
                 data = await websocket.receive_bytes()
                 if not data:
                     break
-                yield data
-        
-        # Process audio stream
-        async for result in pipeline.process_audio_stream(audio_generator()):
+                await frames.put(data)
+        finally:
+            await frames.put(None)
+    
+    async def audio_generator():
+        while (data := await frames.get()) is not None:
+            yield data
+    
+    async def produce_chunks():
+        async for item in pipeline.chunk_audio_stream(audio_generator()):
+            await chunks.put(item)
+        await chunks.put(None)
+    
+    async def chunk_generator():
+        while (item := await chunks.get()) is not None:
+            yield item
+    
+    async def transcribe_chunks():
+        async for result in pipeline.transcribe_chunks(chunk_generator(), language):
             await websocket.send_json(result)
-            
+    
+    tasks = [
+        asyncio.create_task(receive_frames()),
+        asyncio.create_task(produce_chunks()),
+        asyncio.create_task(transcribe_chunks()),
+    ]
+    
+    try:
+        await asyncio.gather(*tasks)
     except Exception as e:
         await websocket.send_json({"error": str(e)})
     finally:
+        for task in tasks:
+            task.cancel()
         await websocket.close()
 
 
@@ -93,7 +180,8 @@ async def transcribe_stream(websocket: WebSocket):
 async def synthesize_speech(
     text: str,
     speaker_id: Optional[str] = None,
-    temperature: float = 0.7
+    temperature: float = 0.7,
+    synthesizer: CSMVoiceSynthesizer = Depends(get_synthesizer)
 ):
     """Synthesize speech from text"""
     
@@ -111,21 +199,20 @@ async def synthesize_speech(
 async def collect_dataset_sample(
     file: UploadFile = File(...),
     speaker_id: str = "default",
-    language: str = "pl"
+    language: str = "pl",
+    collector: DatasetCollector = Depends(get_collector)
 ):
     """Collect audio sample for dataset"""
     
-    # Save uploaded file
-    audio_path = Path(f"/tmp/{file.filename}")
-    with open(audio_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
-    
-    # Collect sample
-    sample = await collector.collect_sample(audio_path, speaker_id, language)
-    
-    # Clean up
-    audio_path.unlink()
+    # Collect sample straight from the upload contents
+    content = await file.read()
+    # Word timings feed the dataset alignments
+    try:
+        sample = await collector.collect_upload(
+            content, file.filename, speaker_id, language, word_timestamps=True
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=415, detail=str(e))
     
     return JSONResponse(content=sample)
 
@@ -133,7 +220,8 @@ async def collect_dataset_sample(
 @app.post("/api/v1/rag/query")
 async def query_rag(
     query: str,
-    top_k: int = 5
+    top_k: int = 5,
+    rag_engine: RAGEngine = Depends(get_rag_engine)
 ):
     """Query RAG knowledge base"""
     
@@ -147,7 +235,8 @@ async def query_rag(
 
 @app.post("/api/v1/rag/index")
 async def index_documents(
-    documents: list[str]
+    documents: list[str],
+    rag_engine: RAGEngine = Depends(get_rag_engine)
 ):
     """Index documents in RAG"""
     
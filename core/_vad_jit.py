@@ -0,0 +1,77 @@
+"""Numba kernels for VAD post-processing"""
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+def _probs_to_segments_py(probs: np.ndarray, threshold: float, window_size: int) -> np.ndarray:
+    """NumPy fallback: rising/falling edges of the speech mask give segment bounds"""
+    speech = (probs >= threshold).astype(np.int8)
+    edges = np.diff(speech, prepend=0, append=0)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return np.stack((starts, ends), axis=1).astype(np.int64) * window_size
+
+
+if njit is not None:
+
+    @njit(cache=True)
+    def probs_to_segments(probs: np.ndarray, threshold: float, window_size: int) -> np.ndarray:
+        """Convert per-window speech probabilities to (M, 2) sample index segments"""
+        n = probs.shape[0]
+        segments = np.empty((n // 2 + 1, 2), dtype=np.int64)
+        m = 0
+        start = -1
+
+        for i in range(n):
+            if probs[i] >= threshold:
+                if start < 0:
+                    start = i
+            elif start >= 0:
+                segments[m, 0] = start * window_size
+                segments[m, 1] = i * window_size
+                m += 1
+                start = -1
+
+        if start >= 0:
+            segments[m, 0] = start * window_size
+            segments[m, 1] = n * window_size
+            m += 1
+
+        return segments[:m]
+
+else:
+    probs_to_segments = _probs_to_segments_py
+
+
+def merge_segments(segments: np.ndarray,
+                   min_silence: int,
+                   min_speech: int,
+                   pad: int,
+                   length: int) -> np.ndarray:
+    """Close gaps shorter than min_silence, drop runs shorter than min_speech, then pad
+    
+    All arguments are in samples. Padding is clipped to [0, length) and
+    never overlaps neighbours as long as min_silence >= 2 * pad.
+    """
+    if not len(segments):
+        return segments
+    
+    split = segments[1:, 0] - segments[:-1, 1] >= min_silence
+    starts = segments[np.r_[True, split], 0]
+    ends = segments[np.r_[split, True], 1]
+    
+    keep = ends - starts >= min_speech
+    starts = np.maximum(starts[keep] - pad, 0)
+    ends = np.minimum(ends[keep] + pad, length)
+    
+    return np.stack((starts, ends), axis=1)
+
+
+def warmup():
+    """Compile (or load from the on-disk cache) ahead of the first request"""
+    probs_to_segments(np.zeros(8, np.float32), 0.5, 512)
@@ -8,12 +8,25 @@ import threading
 import queue
 import time
 from pathlib import Path
-from typing import Optional, Callable, Any
+from typing import Optional, Callable, Any, List
 import numpy as np
 import sounddevice as sd
 import soundfile as sf
 from datetime import datetime
 
+# SIMD RMS (optional, avoids the squared temporary)
+try:
+    from numpy_rms import rms as _rms_simd
+except ImportError:
+    _rms_simd = None
+
+
+def _rms(audio: np.ndarray) -> float:
+    """RMS level over all samples of a chunk"""
+    if _rms_simd is not None and audio.dtype == np.float32 and audio.flags.c_contiguous:
+        return float(_rms_simd(audio.reshape(-1))[0])
+    return float(np.sqrt(np.mean(audio**2)))
+
 
 class AudioRecorder:
     """Real-time audio recorder with callback support"""
@@ -23,7 +36,9 @@ class AudioRecorder:
         sample_rate: int = 16000,
         channels: int = 1,
         device: Optional[int] = None,
-        chunk_duration: float = 0.5
+        chunk_duration: float = 0.5,
+        max_seconds: float = 600,
+        queue_size: int = 64
     ):
         self.sample_rate = sample_rate
         self.channels = channels
@@ -32,10 +47,22 @@ class AudioRecorder:
         self.chunk_size = int(sample_rate * chunk_duration)
         
         self.is_recording = False
-        self.audio_queue = queue.Queue()
-        self.recorded_audio = []
+        # For an external consumer, nothing in this package reads it. Bounded
+        # so a stalled consumer cannot pile up chunks; the oldest chunk is
+        # dropped (and counted) when full. Without a consumer the queue stays
+        # full and dropped_chunks counts every chunk past queue_size.
+        self.audio_queue = queue.Queue(maxsize=queue_size)
+        self.dropped_chunks = 0
         self.stream = None
         
+        # Session buffer, allocated per recording for max_seconds; audio past
+        # that is kept as per-chunk overflow blocks, joined on stop
+        self._max_seconds = max_seconds
+        self._buf: Optional[np.ndarray] = None
+        self._write = 0
+        self._overflow: List[np.ndarray] = []
+        self.overrun_frames = 0
+        
         # Callbacks
         self.on_audio_chunk: Optional[Callable[[np.ndarray], None]] = None
         self.on_level_update: Optional[Callable[[float], None]] = None
@@ -45,24 +72,38 @@ class AudioRecorder:
         if status:
             print(f"Audio callback status: {status}")
         
-        # Copy audio data
-        audio_chunk = indata.copy()
-        
-        # Add to queue
-        self.audio_queue.put(audio_chunk)
+        # Copy audio data straight into the session buffer; never reallocate
+        # here, a full-session copy would stall the audio thread
+        n = indata.shape[0]
+        if self._write + n <= len(self._buf):
+            audio_chunk = self._buf[self._write:self._write + n]
+            audio_chunk[:] = indata
+            self._write += n
+        else:
+            audio_chunk = indata.copy()
+            self._overflow.append(audio_chunk)
+            self.overrun_frames += n
         
-        # Store for saving
-        self.recorded_audio.append(audio_chunk)
+        # Add to queue, chunks are views into the session buffer until it is full
+        try:
+            self.audio_queue.put_nowait(audio_chunk)
+        except queue.Full:
+            try:
+                self.audio_queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.dropped_chunks += 1
+            self.audio_queue.put_nowait(audio_chunk)
         
         # Calculate RMS level
-        rms = np.sqrt(np.mean(audio_chunk**2))
+        rms = _rms(audio_chunk)
         
         # Call callbacks
         if self.on_audio_chunk:
             self.on_audio_chunk(audio_chunk)
         
         if self.on_level_update:
-            self.on_level_update(float(rms))
+            self.on_level_update(rms)
     
     def start_recording(self):
         """Start audio recording"""
@@ -70,7 +111,7 @@ class AudioRecorder:
             return
         
         self.is_recording = True
-        self.recorded_audio = []
+        self._new_session()
         
         # Start audio stream
         self.stream = sd.InputStream(
@@ -84,6 +125,18 @@ class AudioRecorder:
         self.stream.start()
         print(f"Recording started on device {self.device}")
     
+    def _new_session(self):
+        """Reset counters and allocate the session buffer"""
+        self.dropped_chunks = 0
+        self.overrun_frames = 0
+        
+        # Fresh buffer so views returned by a previous stop_recording stay intact
+        self._buf = np.empty(
+            (int(self._max_seconds * self.sample_rate), self.channels), dtype=np.float32
+        )
+        self._write = 0
+        self._overflow = []
+    
     def stop_recording(self) -> np.ndarray:
         """Stop recording and return audio data"""
         if not self.is_recording:
@@ -96,10 +149,14 @@ class AudioRecorder:
             self.stream.close()
             self.stream = None
         
-        # Concatenate all audio chunks
-        if self.recorded_audio:
-            audio_data = np.concatenate(self.recorded_audio, axis=0)
-            return audio_data
+        # Past max_seconds the overflow blocks are joined on here, off the
+        # audio thread
+        if self._overflow:
+            return np.concatenate([self._buf[:self._write], *self._overflow])
+        
+        # Recorded frames are already contiguous, return a view
+        if self._write:
+            return self._buf[:self._write]
         
         return np.array([])
     
@@ -134,20 +191,31 @@ class VADRecorder(AudioRecorder):
         self.is_speaking = False
         self.on_speech_end = None  # Initialize callback
         self.silence_start = None
-        self.speech_chunks = []
+        
+        # Contiguous mono utterance buffer with a write index
+        self._utter = np.empty(int(30 * self.sample_rate), dtype=np.float32)
+        self._uw = 0
         
     def audio_callback(self, indata, frames, time_info, status):
         """Enhanced callback with VAD"""
         super().audio_callback(indata, frames, time_info, status)
         
         # Simple VAD based on RMS
-        rms = np.sqrt(np.mean(indata**2))
+        rms = _rms(indata)
         
         if rms > self.vad_threshold:
             # Speech detected
             self.is_speaking = True
             self.silence_start = None
-            self.speech_chunks.append(indata.copy())
+            
+            n = indata.shape[0]
+            if self._uw + n > len(self._utter):
+                grown = np.empty(max(2 * len(self._utter), self._uw + n), dtype=np.float32)
+                grown[:self._uw] = self._utter[:self._uw]
+                self._utter = grown
+            
+            self._utter[self._uw:self._uw + n] = indata[:, 0]
+            self._uw += n
         else:
             # Silence detected
             if self.is_speaking:
@@ -158,14 +226,13 @@ class VADRecorder(AudioRecorder):
                     self.is_speaking = False
                     
                     # Check minimum duration
-                    speech_duration = len(self.speech_chunks) * self.chunk_duration
+                    speech_duration = self._uw / self.sample_rate
                     if speech_duration >= self.min_speech_duration:
-                        # Process speech
+                        # Process speech, copied since the buffer is reused
                         if self.on_speech_end:
-                            speech_audio = np.concatenate(self.speech_chunks, axis=0)
-                            self.on_speech_end(speech_audio)
+                            self.on_speech_end(self._utter[:self._uw].copy())
                     
-                    self.speech_chunks = []
+                    self._uw = 0
     
     def set_on_speech_end(self, callback: Callable[[np.ndarray], None]):
         """Set callback for when speech ends"""
@@ -205,20 +272,33 @@ try:
             self.sample_rate = sample_rate
             self.frame_duration = 30  # ms
             self.frame_size = int(sample_rate * self.frame_duration / 1000)
+            # Scratch buffers, reused across calls
+            self._scaled: Optional[np.ndarray] = None
+            self._pcm: Optional[np.ndarray] = None
             
         def is_speech(self, audio_chunk: np.ndarray) -> bool:
             """Check if audio chunk contains speech"""
-            # Convert to 16-bit PCM
-            audio_int16 = (audio_chunk * 32767).astype(np.int16)
+            audio = np.ravel(audio_chunk)
+            
+            if self._pcm is None or len(self._pcm) != len(audio):
+                self._scaled = np.empty(len(audio), dtype=np.float32)
+                self._pcm = np.empty(len(audio), dtype=np.int16)
+            
+            # Convert to 16-bit PCM: clip (overs would wrap around), scale, round
+            np.clip(audio, -1.0, 1.0, out=self._scaled)
+            np.multiply(self._scaled, 32767.0, out=self._scaled)
+            np.rint(self._scaled, out=self._scaled)
+            self._pcm[:] = self._scaled
             
-            # Process in frames
-            num_frames = len(audio_int16) // self.frame_size
-            speech_frames = 0
+            # Process in frames, zero-copy slices of one byte view
+            num_frames = len(self._pcm) // self.frame_size
+            frame_bytes = self.frame_size * 2
+            pcm = memoryview(self._pcm).cast('B')
             
-            for i in range(num_frames):
-                frame = audio_int16[i * self.frame_size:(i + 1) * self.frame_size]
-                if self.vad.is_speech(frame.tobytes(), self.sample_rate):
-                    speech_frames += 1
+            speech_frames = sum(
+                1 for i in range(num_frames)
+                if self.vad.is_speech(pcm[i * frame_bytes:(i + 1) * frame_bytes], self.sample_rate)
+            )
             
             # Return True if majority of frames contain speech
             return speech_frames > num_frames * 0.5
@@ -1,32 +1,150 @@
 """Core voice processing pipeline"""
 
 import asyncio
+import io
+import os
+import subprocess
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Dict, Any, Optional, AsyncGenerator
+from typing import Dict, Any, Optional, AsyncGenerator, Tuple, Union
 import numpy as np
+import soundfile as sf
+from scipy.signal import resample_poly
 
+# SIMD polyphase resampler (optional, releases the GIL)
+try:
+    import soxr
+except ImportError:
+    soxr = None
+
+import mlx.core as mx
 import mlx_whisper
+from mlx_whisper.load_models import load_model
+from mlx_whisper.transcribe import ModelHolder
 from .audio_recorder import AudioRecorder
+from ._convert import i16_to_f32_scaled
 from .vad import VoiceActivityDetector
 
 
+SAMPLE_RATE = 16000  # Whisper expects 16kHz mono
+CHUNK_SECONDS = 3.0
+OVERLAP_SECONDS = 0.5
+MIN_TAIL_SECONDS = 0.1  # shorter stream tails are not worth a Whisper call
+
+# soxr quality preset: the resampled signal only feeds Whisper, QQ is plenty
+RESAMPLE_QUALITY = os.environ.get("RESAMPLE_QUALITY", "QQ")
+
+
+def decode_audio_bytes(content: bytes,
+                       sample_rate: int = SAMPLE_RATE,
+                       quality: str = RESAMPLE_QUALITY) -> np.ndarray:
+    """Decode an in-memory audio file to mono float32 at the given sample rate
+    
+    Raises ValueError if the contents cannot be decoded.
+    """
+    try:
+        data, sr = sf.read(io.BytesIO(content), dtype="float32", always_2d=True)
+    except sf.LibsndfileError:
+        # Containers libsndfile cannot read (m4a/AAC, WebM, ...)
+        return _ffmpeg_decode(content, sample_rate)
+    
+    # Downmix to mono
+    audio = data.mean(axis=1) if data.shape[1] > 1 else data[:, 0]
+    
+    if sr != sample_rate:
+        if soxr is not None:
+            audio = soxr.resample(audio, sr, sample_rate, quality=quality)
+        else:
+            audio = resample_poly(audio, sample_rate, sr).astype(np.float32)
+    
+    return audio
+
+
+def _ffmpeg_decode(content: bytes, sample_rate: int) -> np.ndarray:
+    """Decode from stdin with ffmpeg, downmixing and resampling in the same pass"""
+    cmd = [
+        "ffmpeg", "-i", "pipe:0",
+        "-threads", "0",
+        "-f", "f32le",
+        "-ac", "1",
+        "-ar", str(sample_rate),
+        "-"
+    ]
+    
+    try:
+        out = subprocess.run(cmd, input=content, capture_output=True, check=True).stdout
+    except FileNotFoundError as e:
+        raise ValueError("Unsupported audio format (ffmpeg not found)") from e
+    except subprocess.CalledProcessError as e:
+        raise ValueError(f"Failed to decode audio: {e.stderr.decode(errors='replace')}") from e
+    
+    return np.frombuffer(out, dtype=np.float32)
+
+
+def _select_words(segments: list, start: float, end: float) -> list:
+    """Keep words starting in [start, end), rebuilding segment text"""
+    selected = []
+    for segment in segments:
+        words = [w for w in segment.get("words", []) if start <= w["start"] < end]
+        if words:
+            selected.append({**segment, "words": words, "text": "".join(w["word"] for w in words)})
+    return selected
+
+
 class VoicePipeline:
     """Production-ready voice processing pipeline"""
     
+    _instances = 0
+    
     def __init__(self, model_name: str = "mlx-community/whisper-medium-mlx"):
+        VoicePipeline._instances += 1
+        if VoicePipeline._instances > 1:
+            warnings.warn(
+                "VoicePipeline created more than once, each instance holds its own "
+                "Whisper weights and VAD; use get_pipeline() to share one",
+                RuntimeWarning,
+                stacklevel=2
+            )
+        
         self.model_name = model_name
         self.model = None
+        self._init_lock = asyncio.Lock()
         self.recorder = AudioRecorder()
         self.vad = VoiceActivityDetector()
+        # One dedicated thread: Whisper calls run one at a time on the warm
+        # model without a batching delay (there is no batch dimension to fill)
+        self._whisper = ThreadPoolExecutor(max_workers=1, thread_name_prefix="whisper")
         
     async def initialize(self):
         """Load models and initialize components"""
-        if not self.model:
-            self.model = await asyncio.to_thread(mlx_whisper.load_model, self.model_name)
+        async with self._init_lock:
+            if self.model is not None:
+                return
+            
+            self.model = await asyncio.to_thread(load_model, self.model_name, mx.float16)
+            
+            # mlx_whisper.transcribe resolves weights through ModelHolder;
+            # seed it so every call reuses the model loaded here
+            ModelHolder.model = self.model
+            ModelHolder.model_path = self.model_name
+    
+    def _transcribe_sync(self, audio: Union[str, np.ndarray], **options) -> Dict[str, Any]:
+        assert self.model is not None, "initialize() must run before transcription"
+        return mlx_whisper.transcribe(audio, path_or_hf_repo=self.model_name, **options)
+    
+    async def _transcribe(self, audio: Union[str, np.ndarray], **options) -> Dict[str, Any]:
+        """Run Whisper on the pipeline's dedicated worker thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._whisper, partial(self._transcribe_sync, audio, **options)
+        )
     
     async def process_audio_stream(self, 
                                  audio_stream: AsyncGenerator[bytes, None],
-                                 language: str = "pl") -> AsyncGenerator[Dict[str, Any], None]:
+                                 language: str = "pl",
+                                 word_timestamps: bool = False) -> AsyncGenerator[Dict[str, Any], None]:
         """Process audio stream with VAD and transcription"""
         
         await self.initialize()
@@ -35,51 +153,216 @@ class VoicePipeline:
         
         async for chunk in audio_stream:
             # Convert bytes to numpy array
-            audio_data = np.frombuffer(chunk, dtype=np.int16).astype(np.float32) / 32768.0
+            samples = np.frombuffer(chunk, dtype=np.int16)
+            audio_data = np.empty(len(samples), dtype=np.float32)
+            i16_to_f32_scaled(samples, audio_data)
             
             # Voice activity detection
             if self.vad.is_speech(audio_data):
                 audio_buffer.append(audio_data)
-            elif audio_buffer:
+                continue
+            
+            if audio_buffer:
                 # Process accumulated audio
                 full_audio = np.concatenate(audio_buffer)
                 
                 # Transcribe
-                result = await asyncio.to_thread(
-                    mlx_whisper.transcribe,
+                result = await self._transcribe(
                     full_audio,
-                    path_or_hf_repo=self.model_name,
                     language=language,
-                    word_timestamps=True
+                    word_timestamps=word_timestamps
                 )
                 
                 yield {
                     "text": result["text"],
                     "segments": result.get("segments", []),
                     "language": result.get("language", language),
-                    "duration": len(full_audio) / 16000
+                    "duration": len(full_audio) / SAMPLE_RATE
                 }
                 
                 audio_buffer = []
     
+    async def chunk_audio_stream(self,
+                                 audio_stream: AsyncGenerator[bytes, None],
+                                 chunk_seconds: float = CHUNK_SECONDS,
+                                 overlap_seconds: float = OVERLAP_SECONDS
+                                 ) -> AsyncGenerator[Tuple[int, int, np.ndarray], None]:
+        """Re-slice int16 PCM into fixed float32 `(offset, prefix, chunk)` items"""
+        # Each chunk after the first repeats the previous chunk's last
+        # `overlap_seconds` as a prefix, so boundary words are heard whole
+        chunk_samples = int(chunk_seconds * SAMPLE_RATE)
+        overlap = int(overlap_seconds * SAMPLE_RATE)
+        min_tail = int(MIN_TAIL_SECONDS * SAMPLE_RATE)
+        
+        # [overlap prefix | chunk body], converted in place
+        ring = np.empty(overlap + chunk_samples, dtype=np.float32)
+        start = overlap  # first chunk has no prefix
+        filled = 0
+        consumed = 0  # stream samples before the current body
+        pending = b""
+        
+        async for data in audio_stream:
+            # Keep a trailing odd byte for the next frame
+            data = pending + data
+            usable = len(data) - len(data) % 2
+            pending = data[usable:]
+            samples = np.frombuffer(data[:usable], dtype=np.int16)
+            
+            while len(samples):
+                n = min(len(samples), chunk_samples - filled)
+                body = ring[overlap + filled:overlap + filled + n]
+                i16_to_f32_scaled(samples[:n], body)
+                filled += n
+                samples = samples[n:]
+                
+                if filled == chunk_samples:
+                    prefix = overlap - start
+                    yield consumed - prefix, prefix, ring[start:].copy()
+                    
+                    ring[:overlap] = ring[len(ring) - overlap:]
+                    consumed += chunk_samples
+                    start = 0
+                    filled = 0
+        
+        if filled >= min_tail:
+            prefix = overlap - start
+            yield consumed - prefix, prefix, ring[start:overlap + filled].copy()
+    
+    async def transcribe_chunk(self,
+                               audio: np.ndarray,
+                               language: str = "pl",
+                               initial_prompt: Optional[str] = None,
+                               skip_seconds: float = 0.0,
+                               hold_seconds: float = 0.0) -> Dict[str, Any]:
+        """Transcribe one streamed chunk, setting aside words in its overlaps"""
+        
+        await self.initialize()
+        
+        split = skip_seconds > 0 or hold_seconds > 0
+        result = await self._transcribe(
+            audio,
+            language=language,
+            initial_prompt=initial_prompt,
+            word_timestamps=split
+        )
+        
+        segments = result.get("segments", [])
+        text = result["text"]
+        held = []
+        
+        if split:
+            # Words starting in the last `hold_seconds` go to "held"
+            cut = max(len(audio) / SAMPLE_RATE - hold_seconds, skip_seconds)
+            held = _select_words(segments, cut, float("inf"))
+            segments = _select_words(segments, skip_seconds, cut)
+            text = "".join(segment["text"] for segment in segments)
+        
+        return {
+            "text": text,
+            "segments": segments,
+            "held": held,
+            "language": result.get("language", language),
+            "duration": len(audio) / SAMPLE_RATE
+        }
+    
+    async def transcribe_chunks(self,
+                                chunks: AsyncGenerator[Tuple[int, int, np.ndarray], None],
+                                language: str = "pl",
+                                overlap_seconds: float = OVERLAP_SECONDS
+                                ) -> AsyncGenerator[Dict[str, Any], None]:
+        """Transcribe `chunk_audio_stream` items, each word sent once"""
+        # Overlaps are split at their middle: the earlier chunk sends words
+        # starting before it and holds back the rest, which the next chunk
+        # re-transcribes; only the last chunk's held words are flushed
+        previous_text = None
+        last = None
+        
+        async for offset, prefix, chunk in chunks:
+            result = await self.transcribe_chunk(
+                chunk, language, previous_text,
+                skip_seconds=prefix / 2 / SAMPLE_RATE,
+                hold_seconds=overlap_seconds / 2
+            )
+            result["start"] = offset / SAMPLE_RATE
+            last = result.pop("held")
+            yield result
+            previous_text = result["text"]
+        
+        if last:
+            yield {
+                **result,
+                "text": "".join(segment["text"] for segment in last),
+                "segments": last
+            }
+    
+    async def transcribe_segments(self,
+                                  audio: np.ndarray,
+                                  language: str = "pl",
+                                  word_timestamps: bool = False) -> AsyncGenerator[Dict[str, Any], None]:
+        """Transcribe a 16kHz waveform speech segment by speech segment
+        
+        With `word_timestamps`, each item also carries a `words` list with
+        times relative to the whole waveform.
+        """
+        
+        await self.initialize()
+        
+        segments = await asyncio.to_thread(self.vad.get_speech_segments, audio)
+        
+        for start, end in segments:
+            result = await self._transcribe(
+                audio[start:end],
+                language=language,
+                word_timestamps=word_timestamps
+            )
+            
+            item = {
+                "start": start / SAMPLE_RATE,
+                "end": end / SAMPLE_RATE,
+                "text": result["text"],
+                "language": result.get("language", language)
+            }
+            
+            if word_timestamps:
+                offset = start / SAMPLE_RATE
+                item["words"] = [
+                    {**word, "start": word["start"] + offset, "end": word["end"] + offset}
+                    for segment in result.get("segments", [])
+                    for word in segment.get("words", [])
+                ]
+            
+            yield item
+    
     async def transcribe_file(self, 
-                            file_path: Path,
-                            language: str = "pl") -> Dict[str, Any]:
-        """Transcribe audio file"""
+                            audio: Union[Path, np.ndarray],
+                            language: str = "pl",
+                            word_timestamps: bool = False) -> Dict[str, Any]:
+        """Transcribe audio file or an already decoded 16kHz float32 waveform
+        
+        `word_timestamps` adds per-word timings to each segment. It costs an
+        extra cross-attention alignment pass (DTW over the alignment heads)
+        per segment, so it is off unless the caller needs the words.
+        """
         
         await self.initialize()
         
-        result = await asyncio.to_thread(
-            mlx_whisper.transcribe,
-            str(file_path),
-            path_or_hf_repo=self.model_name,
+        is_array = isinstance(audio, np.ndarray)
+        
+        result = await self._transcribe(
+            audio if is_array else str(audio),
             language=language,
-            word_timestamps=True
+            word_timestamps=word_timestamps
         )
         
         return {
             "text": result["text"],
             "segments": result.get("segments", []),
             "language": result.get("language", language),
-            "file": str(file_path)
-        }
\ No newline at end of file
+            "file": None if is_array else str(audio)
+        }
+
+
+@lru_cache()
+def get_pipeline() -> VoicePipeline:
+    """Process-wide shared pipeline"""
+    return VoicePipeline()
@@ -1,28 +1,48 @@
 """Voice Activity Detection using Silero VAD"""
 
+import threading
 import torch
 import numpy as np
 from typing import Tuple, Optional
 
+from silero_vad import load_silero_vad
+
+from ._vad_jit import merge_segments, probs_to_segments
+
+# ONNX Runtime (optional, faster than the TorchScript model on CPU)
+try:
+    import onnxruntime  # noqa: F401
+    HAS_ONNX = True
+except ImportError:
+    HAS_ONNX = False
+
 
 class VoiceActivityDetector:
     """Production VAD using Silero"""
     
-    def __init__(self, threshold: float = 0.5, sampling_rate: int = 16000):
+    def __init__(self,
+                 threshold: float = 0.5,
+                 sampling_rate: int = 16000,
+                 min_speech_duration_ms: int = 250,
+                 min_silence_duration_ms: int = 500,
+                 speech_pad_ms: int = 100):
         self.threshold = threshold
         self.sampling_rate = sampling_rate
+        # Segment merging, in samples
+        self.min_speech_samples = sampling_rate * min_speech_duration_ms // 1000
+        self.min_silence_samples = sampling_rate * min_silence_duration_ms // 1000
+        self.speech_pad_samples = sampling_rate * speech_pad_ms // 1000
         self.model = None
+        # Silero carries recurrent state; the shared detector is used from worker threads
+        self._lock = threading.Lock()
         self._load_model()
         
     def _load_model(self):
         """Load Silero VAD model"""
-        self.model, utils = torch.hub.load(
-            repo_or_dir='snakers4/silero-vad',
-            model='silero_vad',
-            force_reload=False,
-            onnx=False
-        )
-        self.model.eval()
+        # Bundled weights, no torch.hub download; ONNX Runtime when installed
+        self.model = load_silero_vad(onnx=HAS_ONNX)
+        if not HAS_ONNX:
+            self.model.eval()
         
     def is_speech(self, audio: np.ndarray) -> bool:
         """Check if audio contains speech"""
@@ -33,33 +53,33 @@ class VoiceActivityDetector:
         audio_tensor = torch.from_numpy(audio).float()
         
         # Get speech probability
-        with torch.no_grad():
+        with self._lock, torch.inference_mode():
             speech_prob = self.model(audio_tensor, self.sampling_rate).item()
             
         return speech_prob >= self.threshold
     
-    def get_speech_segments(self, audio: np.ndarray, 
-                          window_size_ms: int = 30) -> list[Tuple[int, int]]:
+    def get_speech_segments(self, audio: np.ndarray) -> list[Tuple[int, int]]:
         """Get speech segments from audio"""
-        window_size = int(self.sampling_rate * window_size_ms / 1000)
-        segments = []
+        # One audio_forward pass over Silero's native windows, not a call per window
+        window_size = 512 if self.sampling_rate == 16000 else 256
+        if len(audio) < window_size:
+            return []
         
-        current_segment = None
+        audio_tensor = torch.from_numpy(np.ascontiguousarray(audio, dtype=np.float32))
         
-        for i in range(0, len(audio) - window_size, window_size):
-            window = audio[i:i + window_size]
-            
-            if self.is_speech(window):
-                if current_segment is None:
-                    current_segment = [i, i + window_size]
-                else:
-                    current_segment[1] = i + window_size
-            else:
-                if current_segment is not None:
-                    segments.append(tuple(current_segment))
-                    current_segment = None
+        with self._lock, torch.inference_mode():
+            probs = self.model.audio_forward(audio_tensor.unsqueeze(0), self.sampling_rate)
         
-        if current_segment is not None:
-            segments.append(tuple(current_segment))
-            
-        return segments
\ No newline at end of file
+        segments = probs_to_segments(probs[0].numpy(), self.threshold, window_size)
+        
+        # Bridge short pauses, drop short runs and pad, like get_speech_timestamps;
+        # the last window is zero-padded by Silero, ends are clipped to the signal
+        segments = merge_segments(
+            segments,
+            self.min_silence_samples,
+            self.min_speech_samples,
+            self.speech_pad_samples,
+            len(audio)
+        )
+        
+        return [(int(start), int(end)) for start, end in segments]
@@ -1,42 +1,107 @@
 """Dataset collector for MOSHI/MIMI format"""
 
+import io
+import os
+import sys
 import json
 import asyncio
+import ctypes
+import ctypes.util
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import numpy as np
 import soundfile as sf
 
+# Fast JSON encoder (optional, falls back to stdlib json)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from ..core import VoicePipeline
+from ..core.pipeline import SAMPLE_RATE, decode_audio_bytes, get_pipeline
+
+
+# clonefile(2) gives O(1) copy-on-write copies on APFS
+_clonefile = None
+if sys.platform == "darwin":
+    try:
+        _clonefile = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True).clonefile
+        _clonefile.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_uint32]
+        _clonefile.restype = ctypes.c_int
+    except (OSError, AttributeError):
+        _clonefile = None
+
+
+def fast_copy(src: Path, dst: Path):
+    """Copy a file without bouncing the data through user space where possible"""
+    if _clonefile is not None:
+        if _clonefile(os.fsencode(src), os.fsencode(dst), 0) == 0:
+            shutil.copystat(src, dst)
+            return
+    elif hasattr(os, "copy_file_range"):
+        # In-kernel copy, reflinked on btrfs/XFS
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            if remaining <= 0:
+                shutil.copystat(src, dst)
+                return
+        except OSError:
+            pass
+    
+    # sendfile/fcopyfile fast paths inside shutil
+    shutil.copy2(src, dst)
+
+
+def _dump_json(obj: Any, indent: bool = False, newline: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON bytes"""
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if newline:
+            option |= orjson.OPT_APPEND_NEWLINE
+        return orjson.dumps(obj, option=option)
+    
+    data = json.dumps(obj, ensure_ascii=False, indent=2 if indent else None)
+    return (data + "\n" if newline else data).encode("utf-8")
 
 
 class DatasetCollector:
     """Collects voice-text pairs in MOSHI/MIMI format"""
     
-    def __init__(self, output_dir: Path = Path("./dataset")):
+    def __init__(self,
+                 output_dir: Path = Path("./dataset"),
+                 pipeline: Optional[VoicePipeline] = None):
         self.output_dir = output_dir
         self.output_dir.mkdir(parents=True, exist_ok=True)
-        self.pipeline = VoicePipeline()
+        self.pipeline = pipeline or get_pipeline()
         self.metadata = []
         
-    async def collect_sample(self, 
-                           audio_path: Path,
-                           speaker_id: str = "default",
-                           language: str = "pl") -> Dict[str, Any]:
-        """Collect a single audio-text sample"""
-        
-        # Transcribe audio
-        result = await self.pipeline.transcribe_file(audio_path, language)
-        
-        # Load audio for duration and sample rate
-        audio_data, sample_rate = sf.read(audio_path)
-        duration = len(audio_data) / sample_rate
+        # Blocking file work (header reads, copies) runs here so it overlaps
+        # with transcription; Whisper itself is serialized by the pipeline
+        self._io_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="dataset-io")
         
-        # Create sample metadata
-        sample = {
+    def _make_sample(self,
+                     result: Dict[str, Any],
+                     audio_name: str,
+                     duration: float,
+                     sample_rate: int,
+                     speaker_id: str,
+                     language: str) -> Dict[str, Any]:
+        """Build sample metadata from a transcription result"""
+        return {
             "id": f"{speaker_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-            "audio_file": str(audio_path.name),
+            "audio_file": audio_name,
             "text": result["text"],
             "duration": duration,
             "sample_rate": sample_rate,
@@ -45,14 +110,72 @@ class DatasetCollector:
             "segments": result.get("segments", []),
             "timestamp": datetime.now().isoformat()
         }
+    
+    async def collect_sample(self, 
+                           audio_path: Path,
+                           speaker_id: str = "default",
+                           language: str = "pl",
+                           word_timestamps: bool = False) -> Dict[str, Any]:
+        """Collect a single audio-text sample"""
+        
+        loop = asyncio.get_running_loop()
         
-        # Save audio to dataset directory
         output_audio = self.output_dir / "audio" / audio_path.name
         output_audio.parent.mkdir(exist_ok=True)
         
-        # Copy audio file
-        import shutil
-        shutil.copy2(audio_path, output_audio)
+        # Transcribe while the header read and file copy run on the I/O pool
+        result, info, _ = await asyncio.gather(
+            self.pipeline.transcribe_file(audio_path, language, word_timestamps),
+            loop.run_in_executor(self._io_pool, sf.info, audio_path),
+            loop.run_in_executor(self._io_pool, fast_copy, audio_path, output_audio)
+        )
+        
+        # Create sample metadata
+        sample = self._make_sample(
+            result, str(audio_path.name), info.frames / info.samplerate, info.samplerate,
+            speaker_id, language
+        )
+        
+        # Update metadata
+        self.metadata.append(sample)
+        
+        return sample
+    
+    async def collect_upload(self,
+                           content: bytes,
+                           filename: Optional[str],
+                           speaker_id: str = "default",
+                           language: str = "pl",
+                           word_timestamps: bool = False) -> Dict[str, Any]:
+        """Collect a sample from in-memory audio file contents"""
+        
+        # Decode off the event loop and transcribe the waveform directly
+        audio = await asyncio.to_thread(decode_audio_bytes, content)
+        result = await self.pipeline.transcribe_file(audio, language, word_timestamps)
+        
+        # Header read only, no PCM decode; formats libsndfile cannot read
+        # fall back to the decoded waveform
+        try:
+            info = sf.info(io.BytesIO(content))
+            duration, sample_rate = info.frames / info.samplerate, info.samplerate
+        except sf.LibsndfileError:
+            duration, sample_rate = len(audio) / SAMPLE_RATE, SAMPLE_RATE
+        
+        if filename:
+            audio_name = Path(filename).name
+        else:
+            audio_name = f"{speaker_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        
+        sample = self._make_sample(
+            result, audio_name, duration, sample_rate, speaker_id, language
+        )
+        
+        # Write the original upload straight into the dataset directory
+        output_audio = self.output_dir / "audio" / audio_name
+        output_audio.parent.mkdir(exist_ok=True)
+        await asyncio.get_running_loop().run_in_executor(
+            self._io_pool, output_audio.write_bytes, content
+        )
         
         # Update metadata
         self.metadata.append(sample)
@@ -62,11 +185,12 @@ class DatasetCollector:
     async def collect_batch(self, 
                           audio_files: List[Path],
                           speaker_id: str = "default",
-                          language: str = "pl") -> List[Dict[str, Any]]:
+                          language: str = "pl",
+                          word_timestamps: bool = True) -> List[Dict[str, Any]]:
         """Collect multiple samples"""
         
         tasks = [
-            self.collect_sample(audio_file, speaker_id, language)
+            self.collect_sample(audio_file, speaker_id, language, word_timestamps)
             for audio_file in audio_files
         ]
         
@@ -78,27 +202,28 @@ class DatasetCollector:
         output_file = self.output_dir / f"metadata.{format}"
         
         if format == "jsonl":
-            # JSONL format (one JSON object per line)
-            with open(output_file, "w", encoding="utf-8") as f:
+            # JSONL format (one JSON object per line), streamed
+            with open(output_file, "wb") as f:
                 for sample in self.metadata:
-                    f.write(json.dumps(sample, ensure_ascii=False) + "\n")
+                    f.write(_dump_json(sample, newline=True))
         elif format == "json":
             # Standard JSON format
-            with open(output_file, "w", encoding="utf-8") as f:
-                json.dump(self.metadata, f, ensure_ascii=False, indent=2)
+            with open(output_file, "wb") as f:
+                f.write(_dump_json(self.metadata, indent=True))
         
         # Also save in MOSHI/MIMI specific format
+        durations = np.fromiter((s["duration"] for s in self.metadata), dtype=np.float64)
         moshi_format = {
             "version": "1.0",
             "dataset_name": "lbrxVoicePro",
             "language": "pl",
-            "total_duration": sum(s["duration"] for s in self.metadata),
+            "total_duration": float(durations.sum()),
             "total_samples": len(self.metadata),
-            "speakers": list(set(s["speaker_id"] for s in self.metadata)),
+            "speakers": list(dict.fromkeys(s["speaker_id"] for s in self.metadata)),
             "samples": self.metadata
         }
         
-        with open(self.output_dir / "dataset_moshi.json", "w", encoding="utf-8") as f:
-            json.dump(moshi_format, f, ensure_ascii=False, indent=2)
+        with open(self.output_dir / "dataset_moshi.json", "wb") as f:
+            f.write(_dump_json(moshi_format, indent=True))
             
         print(f"✅ Saved {len(self.metadata)} samples to {output_file}")
\ No newline at end of file
@@ -2,11 +2,18 @@
 
 import json
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Sequence
 import numpy as np
 import torch
 
 
+def _column(values: Sequence[Any]) -> List[Any]:
+    """Column as a plain list (numpy scalars become Python objects)"""
+    if isinstance(values, np.ndarray):
+        return values.tolist()
+    return list(values)
+
+
 class MoshiMimiFormatter:
     """Format datasets for MOSHI/MIMI training"""
     
@@ -14,44 +21,74 @@ class MoshiMimiFormatter:
     def to_moshi_format(samples: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Convert to MOSHI training format"""
         
+        return MoshiMimiFormatter.to_moshi_format_soa(
+            ids=[s["id"] for s in samples],
+            audio_files=[s["audio_file"] for s in samples],
+            texts=[s["text"] for s in samples],
+            durations=[s["duration"] for s in samples],
+            speaker_ids=[s.get("speaker_id", "unknown") for s in samples],
+            languages=[s.get("language", "pl") for s in samples],
+            segments=[s.get("segments") for s in samples],
+        )
+    
+    @staticmethod
+    def to_moshi_format_soa(ids: Sequence[str],
+                            audio_files: Sequence[str],
+                            texts: Sequence[str],
+                            durations: Sequence[float],
+                            speaker_ids: Optional[Sequence[str]] = None,
+                            languages: Optional[Sequence[str]] = None,
+                            segments: Optional[Sequence[Optional[List[Dict[str, Any]]]]] = None
+                            ) -> Dict[str, Any]:
+        """Convert columnar samples (one sequence or array per field) to MOSHI format"""
+        
+        n = len(ids)
+        durations = np.asarray(durations, dtype=np.float64)
+        speaker_ids = _column(speaker_ids) if speaker_ids is not None else ["unknown"] * n
+        languages = _column(languages) if languages is not None else ["pl"] * n
+        audio_paths = np.char.add("audio/", np.asarray(audio_files, dtype=str)).tolist()
+        
         moshi_data = {
             "version": "1.0",
             "type": "speech_dataset",
             "metadata": {
-                "languages": list(set(s.get("language", "pl") for s in samples)),
-                "speakers": list(set(s.get("speaker_id", "unknown") for s in samples)),
-                "total_hours": sum(s.get("duration", 0) for s in samples) / 3600,
+                "languages": list(set(languages)),
+                "speakers": list(set(speaker_ids)),
+                "total_hours": float(durations.sum()) / 3600,
                 "sample_rate": 24000,  # MOSHI uses 24kHz
             },
-            "utterances": []
+            "utterances": [
+                {
+                    "id": id_,
+                    "audio_path": audio_path,
+                    "text": text,
+                    "duration": duration,
+                    "speaker": speaker,
+                    "language": language,
+                    # MOSHI specific fields
+                    "semantic_tokens": None,  # Will be generated by MOSHI
+                    "acoustic_tokens": None,  # Will be generated by MOSHI
+                }
+                for id_, audio_path, text, duration, speaker, language in zip(
+                    _column(ids), audio_paths, _column(texts), durations.tolist(),
+                    speaker_ids, languages
+                )
+            ]
         }
         
-        for sample in samples:
-            utterance = {
-                "id": sample["id"],
-                "audio_path": f"audio/{sample['audio_file']}",
-                "text": sample["text"],
-                "duration": sample["duration"],
-                "speaker": sample.get("speaker_id", "unknown"),
-                "language": sample.get("language", "pl"),
-                # MOSHI specific fields
-                "semantic_tokens": None,  # Will be generated by MOSHI
-                "acoustic_tokens": None,  # Will be generated by MOSHI
-            }
-            
-            # Add word-level alignments if available
-            if "segments" in sample and sample["segments"]:
-                utterance["alignments"] = [
-                    {
-                        "word": seg.get("text", ""),
-                        "start": seg.get("start", 0),
-                        "end": seg.get("end", 0)
-                    }
-                    for seg in sample["segments"]
-                    if "start" in seg and "end" in seg
-                ]
-            
-            moshi_data["utterances"].append(utterance)
+        # Add word-level alignments if available
+        if segments is not None:
+            for utterance, segs in zip(moshi_data["utterances"], segments):
+                if segs:
+                    utterance["alignments"] = [
+                        {
+                            "word": seg.get("text", ""),
+                            "start": seg.get("start", 0),
+                            "end": seg.get("end", 0)
+                        }
+                        for seg in segs
+                        if "start" in seg and "end" in seg
+                    ]
         
         return moshi_data
     
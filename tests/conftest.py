@@ -0,0 +1,49 @@
+"""Shared test fixtures"""
+
+from types import SimpleNamespace
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def core_mod():
+    """Core classes and helpers, imported once per session"""
+    from core import AudioRecorder, VoicePipeline, VoiceActivityDetector
+    from core.audio_recorder import _rms
+    from core.pipeline import decode_audio_bytes
+    from core._convert import i16_to_f32_scaled
+    from core._vad_jit import merge_segments, probs_to_segments, _probs_to_segments_py
+    
+    return SimpleNamespace(
+        AudioRecorder=AudioRecorder,
+        VoicePipeline=VoicePipeline,
+        VoiceActivityDetector=VoiceActivityDetector,
+        rms=_rms,
+        decode_audio_bytes=decode_audio_bytes,
+        i16_to_f32_scaled=i16_to_f32_scaled,
+        probs_to_segments=probs_to_segments,
+        probs_to_segments_py=_probs_to_segments_py,
+        merge_segments=merge_segments,
+    )
+
+
+@pytest.fixture(scope="session")
+def pipeline(core_mod):
+    """One VoicePipeline shared by the session; patch it with monkeypatch"""
+    return core_mod.VoicePipeline()
+
+
+@pytest.fixture(scope="session")
+def dataset_mod():
+    """Dataset collector, imported once per session"""
+    from dataset.collector import DatasetCollector, fast_copy
+    
+    return SimpleNamespace(DatasetCollector=DatasetCollector, fast_copy=fast_copy)
+
+
+@pytest.fixture(scope="session")
+def formatter_mod():
+    """MOSHI/MIMI formatter, imported once per session"""
+    from dataset.formatter import MoshiMimiFormatter
+    
+    return SimpleNamespace(MoshiMimiFormatter=MoshiMimiFormatter)
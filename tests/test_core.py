@@ -1,50 +1,129 @@
 """Test core components"""
 
+import asyncio
+import io
+import json
+import os
+import time
+
 import pytest
 import numpy as np
+import soundfile as sf
 from pathlib import Path
 
 
-def test_imports():
+def test_imports(core_mod):
     """Test that core imports work"""
-    from core import AudioRecorder, VoicePipeline, VoiceActivityDetector
-    
-    assert AudioRecorder is not None
-    assert VoicePipeline is not None
-    assert VoiceActivityDetector is not None
+    assert core_mod.AudioRecorder is not None
+    assert core_mod.VoicePipeline is not None
+    assert core_mod.VoiceActivityDetector is not None
 
 
-def test_audio_recorder():
+def test_audio_recorder(core_mod):
     """Test audio recorder initialization"""
-    from core.audio_recorder import AudioRecorder
-    
-    recorder = AudioRecorder()
+    recorder = core_mod.AudioRecorder()
     assert recorder.sample_rate == 16000
     assert recorder.channels == 1
 
 
+def test_audio_recorder_overflow(core_mod):
+    """Test the callback fills the session buffer and keeps audio past max_seconds"""
+    recorder = core_mod.AudioRecorder(chunk_duration=0.25, max_seconds=0.5)
+    # What start_recording sets up, without opening a stream
+    recorder._new_session()
+    recorder.is_recording = True
+    
+    for i in range(3):
+        recorder.audio_callback(np.full((4000, 1), i, dtype=np.float32), 4000, None, None)
+    
+    assert recorder._write == 8000
+    assert recorder.overrun_frames == 4000
+    
+    audio = recorder.stop_recording()
+    assert audio.shape == (12000, 1)
+    np.testing.assert_array_equal(audio[:, 0], np.repeat([0, 1, 2], 4000))
+
+
+def test_audio_recorder_queue_drops_oldest(core_mod):
+    """Test a full chunk queue drops its oldest chunk and counts it"""
+    recorder = core_mod.AudioRecorder(chunk_duration=0.25, queue_size=2)
+    recorder._new_session()
+    recorder.is_recording = True
+    
+    for i in range(3):
+        recorder.audio_callback(np.full((4000, 1), i, dtype=np.float32), 4000, None, None)
+    
+    assert recorder.dropped_chunks == 1
+    queued = [recorder.audio_queue.get_nowait() for _ in range(recorder.audio_queue.qsize())]
+    assert [chunk[0, 0] for chunk in queued] == [1, 2]
+
+
+def test_rms_fast_path(core_mod):
+    """Test the numpy-rms level matches the NumPy fallback"""
+    pytest.importorskip("numpy_rms")
+    audio = np.random.default_rng(0).uniform(-1, 1, (8000, 1)).astype(np.float32)
+    
+    assert core_mod.rms(audio) == pytest.approx(float(np.sqrt(np.mean(audio**2))), rel=1e-5)
+
+
 @pytest.mark.asyncio
-async def test_pipeline_init():
+async def test_pipeline_init(pipeline):
     """Test pipeline initialization"""
-    from core.pipeline import VoicePipeline
-    
-    pipeline = VoicePipeline()
     assert pipeline.model_name == "mlx-community/whisper-medium-mlx"
     assert pipeline.model is None  # Not loaded yet
 
 
-def test_dataset_collector():
+def test_dataset_collector(dataset_mod):
     """Test dataset collector"""
-    from dataset.collector import DatasetCollector
-    
-    collector = DatasetCollector()
+    collector = dataset_mod.DatasetCollector()
     assert collector.output_dir.exists()
     assert len(collector.metadata) == 0
 
 
-def test_formatter():
+def test_save_metadata_round_trip(dataset_mod, tmp_path, monkeypatch):
+    """Test JSONL/JSON metadata parses back the same with orjson and stdlib json"""
+    collector = dataset_mod.DatasetCollector(output_dir=tmp_path, pipeline=object())
+    collector.metadata = [{
+        "id": f"test_{i:03d}",
+        "audio_file": f"test_{i}.wav",
+        "text": "Zażółć gęślą jaźń",
+        "duration": 2.5,
+        "speaker_id": "test_speaker",
+        "language": "pl",
+        "segments": [{"text": "Zażółć", "start": 0.0, "end": 1.0}]
+    } for i in range(2)]
+    
+    for orjson in (True, False):
+        if not orjson:
+            monkeypatch.setattr(f"{dataset_mod.DatasetCollector.__module__}.orjson", None)
+        
+        collector.save_metadata("jsonl")
+        lines = (tmp_path / "metadata.jsonl").read_text(encoding="utf-8").splitlines()
+        assert [json.loads(line) for line in lines] == collector.metadata
+        
+        collector.save_metadata("json")
+        assert json.loads((tmp_path / "metadata.json").read_bytes()) == collector.metadata
+        assert json.loads((tmp_path / "dataset_moshi.json").read_bytes())["samples"] == collector.metadata
+
+
+def test_fast_copy(dataset_mod, tmp_path):
+    """Test fast_copy reproduces bytes and mtime, replacing an existing file"""
+    src = tmp_path / "src.wav"
+    src.write_bytes(bytes(range(256)) * 64)
+    os.utime(src, (1_000_000_000, 1_000_000_000))
+    
+    existing = tmp_path / "existing.wav"
+    existing.write_bytes(b"x" * 100_000)
+    
+    for dst in (tmp_path / "new.wav", existing):
+        dataset_mod.fast_copy(src, dst)
+        assert dst.read_bytes() == src.read_bytes()
+        assert dst.stat().st_mtime == src.stat().st_mtime
+
+
+def test_formatter(formatter_mod):
     """Test MOSHI/MIMI formatter"""
-    from dataset.formatter import MoshiMimiFormatter
+    MoshiMimiFormatter = formatter_mod.MoshiMimiFormatter
     
     samples = [{
         "id": "test_001",
@@ -61,4 +140,203 @@ def test_formatter():
     
     mimi_data = MoshiMimiFormatter.to_mimi_format(samples)
     assert mimi_data["codec"] == "mimi"
-    assert len(mimi_data["data"]) == 1
\ No newline at end of file
+    assert len(mimi_data["data"]) == 1
+
+
+def test_formatter_soa(formatter_mod):
+    """Test columnar MOSHI conversion matches the list-of-dicts entry point"""
+    MoshiMimiFormatter = formatter_mod.MoshiMimiFormatter
+    
+    samples = [{
+        "id": "test_001",
+        "audio_file": "test.wav",
+        "text": "Test transcription",
+        "duration": 2.5,
+        "speaker_id": "test_speaker",
+        "language": "pl",
+        "segments": [{"text": "Test", "start": 0.0, "end": 1.0}]
+    }]
+    
+    moshi_data = MoshiMimiFormatter.to_moshi_format_soa(
+        ids=np.array(["test_001"]),
+        audio_files=["test.wav"],
+        texts=["Test transcription"],
+        durations=np.array([2.5]),
+        speaker_ids=["test_speaker"],
+        languages=["pl"],
+        segments=[samples[0]["segments"]],
+    )
+    assert moshi_data == MoshiMimiFormatter.to_moshi_format(samples)
+    assert moshi_data["utterances"][0]["audio_path"] == "audio/test.wav"
+    assert moshi_data["utterances"][0]["alignments"] == [
+        {"word": "Test", "start": 0.0, "end": 1.0}
+    ]
+
+
+def test_decode_audio_bytes(core_mod):
+    """Test in-memory decoding to 16kHz mono float32"""
+    buf = io.BytesIO()
+    sf.write(buf, np.zeros((44100, 2), dtype=np.float32), 44100, format="WAV")
+    
+    audio = core_mod.decode_audio_bytes(buf.getvalue())
+    assert audio.dtype == np.float32
+    assert audio.ndim == 1
+    assert len(audio) == 16000
+
+
+def test_decode_audio_bytes_soxr(core_mod, monkeypatch):
+    """Test the soxr resampler matches the scipy fallback"""
+    pytest.importorskip("soxr")
+    t = np.arange(44100) / 44100
+    buf = io.BytesIO()
+    sf.write(buf, 0.5 * np.sin(2 * np.pi * 440 * t).astype(np.float32), 44100, format="WAV")
+    
+    fast = core_mod.decode_audio_bytes(buf.getvalue())
+    monkeypatch.setattr(f"{core_mod.decode_audio_bytes.__module__}.soxr", None)
+    fallback = core_mod.decode_audio_bytes(buf.getvalue())
+    
+    assert fast.dtype == fallback.dtype == np.float32
+    assert len(fast) == len(fallback) == 16000
+    # Filters differ slightly, compare away from the edges
+    np.testing.assert_allclose(fast[1000:-1000], fallback[1000:-1000], atol=1e-2)
+
+
+def test_decode_audio_bytes_invalid(core_mod):
+    """Test undecodable uploads raise ValueError instead of a libsndfile error"""
+    with pytest.raises(ValueError):
+        core_mod.decode_audio_bytes(b"not audio")
+
+
+def test_probs_to_segments(core_mod):
+    """Test VAD probability runs are merged into sample segments"""
+    probs = np.array([0.9, 0.1, 0.8, 0.7, 0.2, 0.6], dtype=np.float32)
+    expected = [[0, 512], [1024, 2048], [2560, 3072]]
+    
+    assert core_mod.probs_to_segments(probs, 0.5, 512).tolist() == expected
+    assert core_mod.probs_to_segments_py(probs, 0.5, 512).tolist() == expected
+
+
+def test_merge_segments(core_mod):
+    """Test short pauses are bridged, short runs dropped and the rest padded"""
+    segments = np.array([[0, 512], [1024, 4096], [20000, 20480], [40000, 48000]], dtype=np.int64)
+    
+    merged = core_mod.merge_segments(segments, 8000, 4000, 1600, 46000)
+    assert merged.tolist() == [[0, 5696], [38400, 46000]]
+
+
+@pytest.mark.asyncio
+async def test_transcribe_segments_offsets(pipeline, monkeypatch):
+    """Test segment and word times are offset to the whole waveform"""
+    monkeypatch.setattr(pipeline, "model", object())  # skip the Whisper load
+    
+    monkeypatch.setattr(pipeline.vad, "get_speech_segments",
+                        lambda audio: [(16000, 32000), (48000, 56000)])
+    
+    async def fake_transcribe(audio, **options):
+        return {
+            "text": str(len(audio)),
+            "segments": [{"words": [{"word": "a", "start": 0.25, "end": 0.5}]}]
+        }
+    
+    monkeypatch.setattr(pipeline, "_transcribe", fake_transcribe)
+    
+    audio = np.zeros(64000, dtype=np.float32)
+    items = [item async for item in pipeline.transcribe_segments(audio, word_timestamps=True)]
+    
+    assert [(item["start"], item["end"]) for item in items] == [(1.0, 2.0), (3.0, 3.5)]
+    assert [item["text"] for item in items] == ["16000", "8000"]
+    assert items[0]["words"] == [{"word": "a", "start": 1.25, "end": 1.5}]
+    assert items[1]["words"] == [{"word": "a", "start": 3.25, "end": 3.5}]
+
+
+@pytest.mark.asyncio
+async def test_transcribe_serialized(pipeline, monkeypatch):
+    """Test concurrent Whisper calls run one at a time and errors reach their caller"""
+    running = []
+    
+    def fake_transcribe_sync(audio, **options):
+        running.append(audio)
+        assert len(running) == 1
+        time.sleep(0.01)
+        running.pop()
+        if audio < 0:
+            raise ValueError("negative")
+        return audio * 2
+    
+    monkeypatch.setattr(pipeline, "_transcribe_sync", fake_transcribe_sync)
+    results = await asyncio.gather(
+        *[pipeline._transcribe(i) for i in (1, 2, -1, 3)], return_exceptions=True
+    )
+    
+    assert results[:2] == [2, 4]
+    assert isinstance(results[2], ValueError)
+    assert results[3] == 6
+
+
+@pytest.mark.asyncio
+async def test_chunk_audio_stream(pipeline):
+    """Test fixed chunks carry the overlap prefix, offsets and odd-byte splits"""
+    
+    async def stream(pcm: bytes):
+        # 333-byte pieces split int16 samples across messages
+        for i in range(0, len(pcm), 333):
+            yield pcm[i:i + 333]
+    
+    async def chunks(n_samples: int):
+        pcm = np.arange(n_samples, dtype=np.int16)
+        return pcm, [
+            item async for item in pipeline.chunk_audio_stream(
+                stream(pcm.tobytes()), chunk_seconds=0.125, overlap_seconds=0.03125
+            )
+        ]
+    
+    # 2000-sample chunks with a 500-sample prefix, then a 1600-sample tail
+    pcm, items = await chunks(7600)
+    assert [len(chunk) for _, _, chunk in items] == [2000, 2500, 2500, 2100]
+    assert [offset for offset, _, _ in items] == [0, 1500, 3500, 5500]
+    assert [prefix for _, prefix, _ in items] == [0, 500, 500, 500]
+    
+    for offset, _, chunk in items:
+        expected = pcm[offset:offset + len(chunk)].astype(np.float32) / 32768.0
+        np.testing.assert_array_equal(chunk, expected)
+    
+    # A tail with (almost) no new audio is not emitted
+    _, items = await chunks(4001)
+    assert [len(chunk) for _, _, chunk in items] == [2000, 2500]
+
+
+@pytest.mark.asyncio
+async def test_transcribe_chunks_split_overlap(pipeline, monkeypatch):
+    """Test a word straddling a chunk boundary is sent once, from the chunk that heard it whole"""
+    monkeypatch.setattr(pipeline, "model", object())  # skip the Whisper load
+    
+    # 1s chunk, then a 1.5s chunk starting 0.5s in: the overlap is split at 0.75s
+    words = {
+        16000: [{"word": " a", "start": 0.1}, {"word": " wo", "start": 0.85}],
+        24000: [{"word": " a", "start": 0.0}, {"word": " word", "start": 0.35},
+                {"word": " b", "start": 1.0}, {"word": " c", "start": 1.3}],
+    }
+    
+    async def fake_transcribe(audio, **options):
+        assert options["word_timestamps"]
+        return {"text": "", "segments": [{"words": words[len(audio)]}]}
+    
+    monkeypatch.setattr(pipeline, "_transcribe", fake_transcribe)
+    
+    async def chunks():
+        yield 0, 0, np.zeros(16000, np.float32)
+        yield 8000, 8000, np.zeros(24000, np.float32)
+    
+    results = [result async for result in pipeline.transcribe_chunks(chunks(), overlap_seconds=0.5)]
+    # The last chunk's held back words are flushed at the end
+    assert [result["text"] for result in results] == [" a", " word b", " c"]
+    assert [result["start"] for result in results] == [0.0, 0.5, 0.5]
+
+
+def test_i16_to_f32_scaled(core_mod):
+    """Test int16 PCM conversion matches the NumPy reference"""
+    src = np.array([-32768, -1, 0, 1, 32767], dtype=np.int16)
+    dst = np.empty(len(src), dtype=np.float32)
+    core_mod.i16_to_f32_scaled(src, dst)
+    
+    np.testing.assert_allclose(dst, src.astype(np.float32) / 32768.0)